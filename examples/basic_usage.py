@@ -3,7 +3,9 @@ from auto_commit_bot.config import Config
 from auto_commit_bot.git_utils import get_git_diff, is_git_repo
 import os
 import click
-import tempfile
+import subprocess
+
+_FORMAT_CHOICE = click.Choice(['short', 'detailed'])
 
 def setup_config():
     """Setup basic configuration"""
@@ -48,17 +50,17 @@ def execute_git_commit(message: str, format_type: str) -> bool:
     try:
         if format_type == "short" or "\n" not in message:
             # For single-line messages, use -m
-            result = os.system(f'git commit -m "{message}"')
+            result = subprocess.run(["git", "commit", "-m", message], check=False)
         else:
-            # For multi-line messages, write to temp file and use -F
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, encoding='utf-8') as f:
-                f.write(message)
-                temp_file = f.name
-            
-            result = os.system(f'git commit -F "{temp_file}"')
-            os.unlink(temp_file)  # Clean up temp file
+            # For multi-line messages, pipe the message to -F via stdin
+            result = subprocess.run(
+                ["git", "commit", "-F", "-"],
+                input=message,
+                encoding="utf-8",
+                check=False
+            )
             
-        return result == 0
+        return result.returncode == 0
     except Exception as e:
         print(f"❌ Error during commit: {str(e)}")
         return False
@@ -93,7 +95,8 @@ def generate_commit_message(format_type: str = "short"):
         print("Tip: Use 'git add <file>' to stage changes")
         print("     Use 'git status' to check current status")
         return None
-    print(f"✓ Successfully retrieved Git diff ({len(diff.splitlines())} lines of changes)")
+    line_count = diff.count("\n") + 1
+    print(f"✓ Successfully retrieved Git diff ({line_count} lines of changes)")
     
     # Generate commit message
     print("\nGenerating commit message...")
@@ -108,7 +111,7 @@ def generate_commit_message(format_type: str = "short"):
     return message
 
 @click.command()
-@click.option('--format-type', type=click.Choice(['short', 'detailed']), default='short',
+@click.option('--format-type', type=_FORMAT_CHOICE, default='short',
               help='Commit message format type (short or detailed)')
 def main(format_type):
     """Auto Commit Bot Example Program"""
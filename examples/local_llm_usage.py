@@ -4,13 +4,19 @@ Example of using Auto Commit Bot with a local LLM (meta-llama/Llama-3.2-1B)
 from auto_commit_bot.llm_utils import LLMProvider
 from auto_commit_bot.config import Config
 from auto_commit_bot.git_utils import get_git_diff, is_git_repo
-import os
 import click
-import tempfile
-import torch
+import subprocess
+
+_FORMAT_CHOICE = click.Choice(['short', 'detailed'])
+
+def _torch():
+    """Import torch on first use, it takes seconds to load"""
+    import torch
+    return torch
 
 def check_gpu_availability():
     """Check if CUDA GPU is available"""
+    torch = _torch()
     if torch.cuda.is_available():
         device = torch.cuda.get_device_name(0)
         memory = torch.cuda.get_device_properties(0).total_memory / 1024**3  # Convert to GB
@@ -84,17 +90,17 @@ def execute_git_commit(message: str, format_type: str) -> bool:
     try:
         if format_type == "short" or "\n" not in message:
             # For single-line messages, use -m
-            result = os.system(f'git commit -m "{message}"')
+            result = subprocess.run(["git", "commit", "-m", message], check=False)
         else:
-            # For multi-line messages, write to temp file and use -F
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, encoding='utf-8') as f:
-                f.write(message)
-                temp_file = f.name
-            
-            result = os.system(f'git commit -F "{temp_file}"')
-            os.unlink(temp_file)  # Clean up temp file
+            # For multi-line messages, pipe the message to -F via stdin
+            result = subprocess.run(
+                ["git", "commit", "-F", "-"],
+                input=message,
+                encoding="utf-8",
+                check=False
+            )
             
-        return result == 0
+        return result.returncode == 0
     except Exception as e:
         print(f"❌ Error during commit: {str(e)}")
         return False
@@ -122,15 +128,16 @@ def generate_commit_message(format_type: str = "short"):
     
     # Create a new configuration specifically for this LLM instance
     config = Config()
+    has_gpu = _torch().cuda.is_available()
     
     # Set all required configurations
     config_dict = {
         "provider_type": "local",
         "model_name": "meta-llama/Llama-3.2-1B",
-        "device": "cuda" if torch.cuda.is_available() else "cpu",
-        "device_map": "auto" if torch.cuda.is_available() else None,
+        "device": "cuda" if has_gpu else "cpu",
+        "device_map": "auto" if has_gpu else None,
         "load_in_8bit": True,
-        "torch_dtype": "float16" if torch.cuda.is_available() else "float32",
+        "torch_dtype": "float16" if has_gpu else "float32",
         # Generation parameters
         "max_length": 2048,
         "max_new_tokens": 100,
@@ -160,7 +167,8 @@ def generate_commit_message(format_type: str = "short"):
         print("Tip: Use 'git add <file>' to stage changes")
         print("     Use 'git status' to check current status")
         return None
-    print(f"✓ Successfully retrieved Git diff ({len(diff.splitlines())} lines of changes)")
+    line_count = diff.count("\n") + 1
+    print(f"✓ Successfully retrieved Git diff ({line_count} lines of changes)")
     
     # Generate commit message
     print("\nGenerating commit message...")
@@ -176,7 +184,7 @@ def generate_commit_message(format_type: str = "short"):
     return message
 
 @click.command()
-@click.option('--format-type', type=click.Choice(['short', 'detailed']), default='short',
+@click.option('--format-type', type=_FORMAT_CHOICE, default='short',
               help='Commit message format type (short or detailed)')
 @click.option('--max-new-tokens', type=int, default=100,
               help='Maximum number of tokens to generate')
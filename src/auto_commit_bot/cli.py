@@ -1,31 +1,34 @@
 """
 Command-line interface for Auto Commit Bot
 """
+import logging
 import sys
 import click
 from . import __version__
-from .config import config
+from .config import get_config
 from .git_utils import (
     is_git_repo,
-    has_staged_changes,
-    get_git_diff,
     stage_all_changes,
     commit_changes,
-    get_changed_files
+    RepoSession
 )
-from .llm_utils import LLMProvider
+from .llm_utils import LLMProvider, rule_based_message
+
+# Shared option types, built once
+_PROVIDER_CHOICE = click.Choice(["api", "local"])
 
 @click.group()
 @click.version_option(version=__version__)
-def cli():
+@click.option("--verbose", is_flag=True, envvar="ACB_VERBOSE", help="Show progress and debug output")
+def cli(verbose: bool):
     """Auto Commit Bot - Generate commit messages using LLM"""
-    pass
+    logging.basicConfig(format="%(message)s")
+    logging.getLogger("auto_commit_bot").setLevel(logging.DEBUG if verbose else logging.WARNING)
 
 @cli.command()
 @click.option("--dry-run", is_flag=True, help="Preview the commit message without committing")
 @click.option("--stage-all", is_flag=True, help="Stage all changes before committing")
-@click.option("--provider", type=click.Choice(["api", "local"]),
-              help="Override the provider type")
+@click.option("--provider", type=_PROVIDER_CHOICE, help="Override the provider type")
 def commit(dry_run: bool, stage_all: bool, provider: str):
     """Generate a commit message and commit changes"""
     # Check if we're in a git repository
@@ -39,35 +42,37 @@ def commit(dry_run: bool, stage_all: bool, provider: str):
             click.echo("Error: Failed to stage changes", err=True)
             sys.exit(1)
 
-    # Check for staged changes
-    if not has_staged_changes():
+    # Collect staged files and the diff once for the whole run
+    session = RepoSession.discover()
+    if session is None:
+        click.echo("Error: Not a git repository", err=True)
+        sys.exit(1)
+
+    if not session.staged:
         click.echo("Error: No staged changes to commit", err=True)
         sys.exit(1)
 
-    # Get the diff
-    diff = get_git_diff(staged=True)
+    diff = session.diff
     if not diff:
         click.echo("Error: Failed to get git diff", err=True)
         sys.exit(1)
 
     # Override provider if specified
     if provider:
-        config.set("provider_type", provider)
-
-    # Initialize LLM provider
-    llm = LLMProvider()
+        get_config().set("provider_type", provider)
 
     # Generate commit message
     click.echo("✅ Analyzing changes...")
-    changed_files = get_changed_files(staged=True)
-    if not changed_files:
-        click.echo("Error: No files to commit", err=True)
-        sys.exit(1)
-
-    for file in changed_files:
+    for file in session.staged:
         click.echo(f"  - {file}")
 
-    message = llm.generate_commit_message(diff)
+    # Obvious changes are named from the file list, before any model is loaded
+    message = None
+    if get_config().get("rule_based_messages", True):
+        message = rule_based_message(session.staged)
+    if not message:
+        llm = LLMProvider()
+        message = llm.generate_commit_message(diff)
     if not message:
         click.echo("Error: Failed to generate commit message", err=True)
         sys.exit(1)
@@ -87,11 +92,12 @@ def commit(dry_run: bool, stage_all: bool, provider: str):
         sys.exit(1)
 
 @cli.command()
-@click.option("--provider", type=click.Choice(["api", "local"]), help="Provider type")
+@click.option("--provider", type=_PROVIDER_CHOICE, help="Provider type")
 @click.option("--api-key", type=str, help="API key for Hugging Face")
 @click.option("--model", type=str, help="Model name")
 def configure(provider: str, api_key: str, model: str):
     """Configure Auto Commit Bot settings"""
+    config = get_config()
     if provider:
         config.set("provider_type", provider)
         click.echo(f"Set provider type to: {provider}")
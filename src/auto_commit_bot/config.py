@@ -1,17 +1,18 @@
 """
 Configuration settings for Auto Commit Bot
 """
+import json
+import logging
 import os
+import stat
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Optional
-import yaml
 import click
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-click.echo("🔄 Loading environment variables...")
-load_dotenv()
-click.echo("✓ Environment variables loaded")
+# Progress output goes to debug logging, shown by `auto-commit --verbose`
+logger = logging.getLogger(__name__)
 
 DEFAULT_CONFIG = {
     "provider_type": "api",  # 'api' or 'local'
@@ -21,58 +22,70 @@ DEFAULT_CONFIG = {
     "huggingface_api_key": None,
     # Local provider settings
     "local_model_name": "gpt2",
+    "quantization": "int8",  # 'int8', 'int4' or None; needs a CUDA GPU and bitsandbytes
+    "local_backend": "torch",  # 'torch' or 'onnx' (INT8 ONNX Runtime on CPU, needs optimum)
+    "torch_compile": False,  # Compile the local model forward pass; pays off only for long sessions
     # Common settings
     "commit_format": "conventional",  # conventional, angular, or gitmoji
     "prompt_template": None,  # Path to custom prompt template
+    "cache_file": "~/.acbcache",  # Cache of generated messages, None to disable
+    "rule_based_messages": True,  # Fixed messages for docs-, test- or dependency-only changes
 }
 
 class Config:
     def __init__(self):
-        click.echo("\n⚙️ Initializing configuration...")
+        # Load environment variables from .env file
+        load_dotenv()
+        logger.debug("\n⚙️ Initializing configuration...")
         self.config_path = Path(".acbconfig")
         self.config = DEFAULT_CONFIG.copy()
-        click.echo("✓ Default configuration loaded")
+        logger.debug("✓ Default configuration loaded")
         self._load_config()
         self._load_env_vars()
 
     def _load_config(self):
         """Load configuration from .acbconfig file if it exists"""
         if self.config_path.exists():
-            click.echo(f"📂 Loading configuration from {self.config_path}...")
+            logger.debug(f"📂 Loading configuration from {self.config_path}...")
             try:
-                with open(self.config_path) as f:
-                    user_config = yaml.safe_load(f)
-                    if user_config:
-                        self.config.update(user_config)
-                        click.echo("✓ Configuration file loaded successfully")
-                    else:
-                        click.echo("ℹ️ Configuration file is empty")
+                text = self.config_path.read_text(encoding="utf-8")
+                if text.lstrip().startswith("{"):
+                    user_config = json.loads(text)
+                else:
+                    # Configuration files written by older versions are YAML
+                    import yaml
+                    user_config = yaml.safe_load(text)
+                if user_config:
+                    self.config.update(user_config)
+                    logger.debug("✓ Configuration file loaded successfully")
+                else:
+                    logger.debug("ℹ️ Configuration file is empty")
             except Exception as e:
                 click.echo(f"❌ Error loading configuration file: {str(e)}", err=True)
         else:
-            click.echo("ℹ️ No configuration file found, using defaults")
+            logger.debug("ℹ️ No configuration file found, using defaults")
 
     def _load_env_vars(self):
         """Load configuration from environment variables"""
-        click.echo("\n🔐 Loading API keys from environment...")
+        logger.debug("\n🔐 Loading API keys from environment...")
         
         # Hugging Face
-        if os.getenv("HUGGINGFACE_API_KEY"):
-            self.config["huggingface_api_key"] = os.getenv("HUGGINGFACE_API_KEY")
-            click.echo("✓ Hugging Face API key loaded")
+        if api_key := os.getenv("HUGGINGFACE_API_KEY"):
+            self.config["huggingface_api_key"] = api_key
+            logger.debug("✓ Hugging Face API key loaded")
         else:
-            click.echo("ℹ️ No Hugging Face API key found in environment")
+            logger.debug("ℹ️ No Hugging Face API key found in environment")
 
     def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
         """Get a configuration value"""
         value = self.config.get(key, default)
         if key != "huggingface_api_key":  # Don't print API key
-            click.echo(f"📖 Config get: {key} = {value}")
+            logger.debug("📖 Config get: %s = %s", key, value)
         return value
 
     def get_all(self) -> Dict:
         """Get all configuration values"""
-        click.echo("📖 Getting all configuration values")
+        logger.debug("📖 Getting all configuration values")
         # Create a copy without sensitive data
         safe_config = self.config.copy()
         if "huggingface_api_key" in safe_config:
@@ -82,20 +95,32 @@ class Config:
     def set(self, key: str, value: str):
         """Set a configuration value"""
         self.config[key] = value
-        if key != "huggingface_api_key":  # Don't print API key
-            click.echo(f"✏️ Config set: {key} = {value}")
-        else:
-            click.echo(f"✏️ Config set: {key} = ***")
+        shown = value if key != "huggingface_api_key" else "***"  # Don't print API key
+        logger.debug("✏️ Config set: %s = %s", key, shown)
 
     def save(self):
         """Save configuration to file"""
-        click.echo(f"\n💾 Saving configuration to {self.config_path}...")
+        logger.debug(f"\n💾 Saving configuration to {self.config_path}...")
+        # Write to a temporary file and rename so an interrupted save can't corrupt the config
+        tmp_path = self.config_path.with_suffix(".tmp")
         try:
-            with open(self.config_path, "w") as f:
-                yaml.dump(self.config, f)
-            click.echo("✓ Configuration saved successfully")
+            # Keep the file's permissions; it holds the API key, so a new file is private
+            try:
+                mode = stat.S_IMODE(self.config_path.stat().st_mode)
+            except FileNotFoundError:
+                mode = 0o600
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(json.dumps(self.config, indent=2, ensure_ascii=False))
+            os.chmod(tmp_path, mode)  # The mode passed to os.open is narrowed by the umask
+            os.replace(tmp_path, self.config_path)
+            logger.debug("✓ Configuration saved successfully")
         except Exception as e:
+            tmp_path.unlink(missing_ok=True)
             click.echo(f"❌ Error saving configuration: {str(e)}", err=True)
 
-# Global config instance
-config = Config() 
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    """Get the shared config instance, created on first use"""
+    return Config()
+ 
\ No newline at end of file
@@ -1,71 +1,124 @@
 """
 Git operations utilities for Auto Commit Bot
 """
+import io
+import logging
+import os
 import subprocess
-from typing import List, Tuple, Optional
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import AnyStr, List, Tuple, Optional, Union
 import click  # Add click for colored output
 
-def run_git_command(command: List[str]) -> Tuple[str, str, int]:
+logger = logging.getLogger(__name__)
+
+# Diff line prefixes used by simplify_diff. str.startswith with a tuple checks
+# every prefix in one C call, which measured faster than per-line re.match
+_SKIP_PREFIXES = ('diff --git', 'index ', '--- ', '+++ ')
+_KEEP_PREFIXES = ('+', '-', '@@ ')
+_SKIP_PREFIXES_BYTES = tuple(p.encode() for p in _SKIP_PREFIXES)
+_KEEP_PREFIXES_BYTES = tuple(p.encode() for p in _KEEP_PREFIXES)
+
+# Options that keep git diff output minimal before simplify_diff sees it
+_DIFF_OPTIONS = ("--unified=0", "--no-color", "--no-ext-diff", "--no-prefix")
+
+def run_git_command(command: List[str], text: bool = True) -> Tuple[Union[str, bytes], str, int]:
     """
     Run a git command and return its output
     
     Args:
         command: List of command parts (e.g., ["git", "diff"])
+        text: Whether to decode stdout, otherwise it is returned as bytes
     
     Returns:
         Tuple of (stdout, stderr, return_code)
     """
     try:
-        click.echo(f"🔄 Executing git command: {' '.join(command)}")
-        process = subprocess.Popen(
+        logger.debug("🔄 Executing git command: %s", " ".join(command))
+        result = subprocess.run(
             command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            encoding='utf-8',  # Explicitly set UTF-8 encoding
-            errors='replace'   # Replace invalid characters instead of failing
+            capture_output=True,
+            encoding='utf-8' if text else None,  # Explicitly set UTF-8 encoding
+            errors='replace' if text else None,  # Replace invalid characters instead of failing
+            check=False
         )
-        stdout, stderr = process.communicate()
-        if process.returncode == 0:
-            click.echo("✓ Command executed successfully")
-        else:
+        stderr = result.stderr if text else result.stderr.decode('utf-8', errors='replace')
+        if result.returncode != 0:
             click.echo(f"❌ Command failed with error: {stderr}", err=True)
-        return stdout.strip(), stderr.strip(), process.returncode
+        else:
+            logger.debug("✓ Command executed successfully")
+        return result.stdout.strip(), stderr.strip(), result.returncode
     except Exception as e:
         click.echo(f"❌ Exception while running git command: {str(e)}", err=True)
-        return "", str(e), 1
+        return "" if text else b"", str(e), 1
 
-def simplify_diff(diff: str, max_length: int = 3000) -> str:
+def simplify_diff(diff: AnyStr, max_length: int = 3000) -> AnyStr:
     """
     Simplify git diff by removing metadata and limiting context
     
     Args:
-        diff: The original git diff output
-        max_length: Maximum length of the simplified diff
+        diff: The original git diff output, as str or raw bytes
+        max_length: Maximum length of the simplified diff (bytes for bytes input)
     
     Returns:
-        Simplified diff content
+        Simplified diff content of the same type as diff
     """
+    # Iterate lines lazily so an oversized diff is only read up to max_length
+    if isinstance(diff, bytes):
+        skip, keep, newline, eol = _SKIP_PREFIXES_BYTES, _KEEP_PREFIXES_BYTES, b'\n', b'\r\n'
+        lines = io.BytesIO(diff)
+    else:
+        skip, keep, newline, eol = _SKIP_PREFIXES, _KEEP_PREFIXES, '\n', '\r\n'
+        lines = io.StringIO(diff, newline='\n')
+    
     simplified_lines = []
-    for line in diff.splitlines():
-        # Skip metadata lines
-        if line.startswith('diff --git') or \
-           line.startswith('index ') or \
-           line.startswith('--- ') or \
-           line.startswith('+++ '):
+    length = 0
+    truncated = False
+    for line in lines:
+        # Skip metadata lines; checked first since '--- '/'+++ ' also match the kept prefixes
+        if line.startswith(skip):
             continue
             
         # Keep changed lines and minimal context
-        if line.startswith('+') or line.startswith('-') or line.startswith('@@ '):
+        if line.startswith(keep):
+            # Lines are split on LF only, so CRLF files also leave a CR to strip
+            line = line.rstrip(eol)
             simplified_lines.append(line)
+            length += len(line) + 1  # Including the joining newline
+            if length - 1 > max_length:
+                truncated = True
+                break
     
     # Join lines and limit length
-    simplified_diff = '\n'.join(simplified_lines)
-    if len(simplified_diff) > max_length:
-        click.echo(f"⚠️ Diff too large ({len(simplified_diff)} chars), truncating to {max_length} chars")
+    simplified_diff = newline.join(simplified_lines)
+    if truncated:
+        click.echo(f"⚠️ Diff too large, truncating to {max_length} chars")
+        if isinstance(simplified_diff, bytes):
+            return _trim_partial_utf8(simplified_diff[:max_length])
         return simplified_diff[:max_length]
     
     return simplified_diff
 
+def _trim_partial_utf8(data: bytes) -> bytes:
+    """
+    Drop a UTF-8 character cut in half at the end of data
+    
+    Args:
+        data: UTF-8 bytes, possibly sliced in the middle of a character
+    
+    Returns:
+        data ending on a character boundary
+    """
+    # A character is at most 4 bytes, so its lead byte is within the last 4
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte & 0xC0 == 0x80:
+            continue  # Continuation byte
+        size = 4 if byte >= 0xF0 else 3 if byte >= 0xE0 else 2 if byte >= 0xC0 else 1
+        return data[:-back] if size > back else data
+    return data
+
 def get_git_diff(staged: bool = True, simplified: bool = True, max_length: int = 3000) -> Optional[str]:
     """
     Get the git diff output
@@ -80,12 +133,13 @@ def get_git_diff(staged: bool = True, simplified: bool = True, max_length: int =
     """
     click.echo(f"\n📝 Getting {'staged' if staged else 'unstaged'} changes...")
     
-    # Use --unified=0 to minimize context lines
-    command = ["git", "diff", "--unified=0"]
+    # Let git drop context lines, colors, prefixes and external diff drivers
+    command = ["git", "diff", *_DIFF_OPTIONS]
     if staged:
         command.append("--staged")
     
-    stdout, stderr, code = run_git_command(command)
+    # Keep the diff as bytes so only the (simplified) result is decoded
+    stdout, stderr, code = run_git_command(command, text=False)
     if code != 0:
         click.echo("❌ Failed to get git diff", err=True)
         return None
@@ -94,15 +148,17 @@ def get_git_diff(staged: bool = True, simplified: bool = True, max_length: int =
         click.echo("ℹ️ No changes found")
         return None
     
-    lines = stdout.splitlines()
-    click.echo(f"✓ Found {len(lines)} lines of changes")
+    # Count newlines in C rather than materializing a list of lines
+    line_count = stdout.count(b"\n") + 1
+    click.echo(f"✓ Found {line_count} lines of changes")
     
     if simplified:
         click.echo("📝 Simplifying diff...")
         stdout = simplify_diff(stdout, max_length)
-        click.echo(f"✓ Simplified diff: {len(stdout)} chars")
+        click.echo(f"✓ Simplified diff: {len(stdout)} bytes")
+    stdout = stdout.decode('utf-8', errors='replace')
 
-    click.echo(f"Debug - Diff: {stdout}")
+    logger.debug("Debug - Diff: %s", stdout)
     
     return stdout
 
@@ -115,6 +171,7 @@ def stage_all_changes() -> bool:
     """
     click.echo("\n📦 Staging all changes...")
     _, _, code = run_git_command(["git", "add", "."])
+    clear_cache()
     if code == 0:
         click.echo("✓ All changes staged successfully")
     else:
@@ -133,25 +190,50 @@ def commit_changes(message: str) -> bool:
     """
     click.echo("\n💾 Committing changes...")
     _, _, code = run_git_command(["git", "commit", "-m", message])
+    clear_cache()
     if code == 0:
         click.echo("✓ Changes committed successfully")
     else:
         click.echo("❌ Failed to commit changes", err=True)
     return code == 0
 
-def is_git_repo() -> bool:
+@lru_cache(maxsize=8)
+def _find_git_root(path: str) -> Optional[Path]:
     """
-    Check if current directory is a git repository
+    Walk up from path looking for a .git directory or file
+    
+    Args:
+        path: Absolute directory to start from
     
     Returns:
-        True if current directory is a git repository
+        The repository root or None if not inside a repository
     """
-    click.echo("\n🔍 Checking if current directory is a git repository...")
-    _, _, code = run_git_command(["git", "rev-parse", "--is-inside-work-tree"])
-    if code == 0:
-        click.echo("✓ Valid git repository found")
-    else:
-        click.echo("❌ Not a git repository", err=True)
+    start = Path(path)
+    for directory in (start, *start.parents):
+        # .git is a file for worktrees and submodules
+        if (directory / ".git").exists():
+            return directory
+    return None
+
+def is_git_repo(cwd: Optional[str] = None) -> bool:
+    """
+    Check if a directory is inside a git repository
+    
+    Args:
+        cwd: Directory to check, defaults to the current directory
+    
+    Returns:
+        True if the directory is inside a git repository
+    """
+    directory = cwd or os.getcwd()
+    # Common case: .git right here, confirmed with a single stat
+    if os.path.exists(os.path.join(directory, ".git")):
+        return True
+    if _find_git_root(os.path.abspath(directory)) is not None:
+        return True
+    
+    # Unusual layouts (GIT_DIR, bare repositories) need git itself
+    _, _, code = run_git_command(["git", "-C", directory, "rev-parse", "--is-inside-work-tree"])
     return code == 0
 
 def has_staged_changes() -> bool:
@@ -162,8 +244,8 @@ def has_staged_changes() -> bool:
         True if there are staged changes
     """
     click.echo("\n🔍 Checking for staged changes...")
-    stdout, _, code = run_git_command(["git", "diff", "--staged", "--name-only"])
-    has_changes = code == 0 and bool(stdout.strip())
+    files = _files_from_status(True)
+    has_changes = bool(files if files is not None else _changed_files(True))
     if has_changes:
         click.echo("✓ Found staged changes")
     else:
@@ -180,21 +262,120 @@ def get_changed_files(staged: bool = True) -> List[str]:
     Returns:
         List of changed file paths
     """
+    files = _files_from_status(staged)
+    return list(files if files is not None else _changed_files(staged))
+
+# (staged, unstaged) from the last successful collect_repo_state call
+_repo_status: Optional[Tuple[Tuple[str, ...], Tuple[str, ...]]] = None
+
+def _files_from_status(staged: bool) -> Optional[Tuple[str, ...]]:
+    """Return changed files from the remembered status parse, if there is one"""
+    if _repo_status is None:
+        return None
+    return _repo_status[0] if staged else _repo_status[1]
+
+@lru_cache(maxsize=4)
+def _changed_files(staged: bool) -> Tuple[str, ...]:
+    """Run git diff --name-only once per process and remember the result"""
     click.echo(f"\n📄 Getting list of {'staged' if staged else 'changed'} files...")
-    command = ["git", "diff", "--name-only"]
+    # -z gives raw NUL-separated paths instead of C-quoted ones
+    command = ["git", "diff", "--name-only", "-z"]
     if staged:
         command.append("--staged")
     
     stdout, _, code = run_git_command(command)
     if code != 0:
         click.echo("❌ Failed to get changed files", err=True)
-        return []
+        return ()
     
-    files = [f for f in stdout.split("\n") if f]
+    files = tuple(f for f in stdout.split("\0") if f)
     if files:
         click.echo(f"✓ Found {len(files)} changed files:")
         for file in files:
             click.echo(f"  - {file}")
     else:
         click.echo("ℹ️ No changed files found")
-    return files 
\ No newline at end of file
+    return files
+
+def clear_cache():
+    """Forget memoized git state, e.g. after the index changed outside this module"""
+    global _repo_status
+    _repo_status = None
+    _changed_files.cache_clear()
+
+def collect_repo_state() -> Tuple[List[str], List[str], bool]:
+    """
+    Collect staged and unstaged files with a single git call
+    
+    The result is remembered until clear_cache(), and has_staged_changes()
+    and get_changed_files() answer from it instead of running git again.
+    
+    Returns:
+        Tuple of (staged_files, unstaged_files, is_repo)
+    """
+    global _repo_status
+    if _repo_status is not None:
+        return list(_repo_status[0]), list(_repo_status[1]), True
+    
+    click.echo("\n🔍 Collecting repository state...")
+    stdout, _, code = run_git_command(["git", "status", "--porcelain=v2", "-z"])
+    if code != 0:
+        click.echo("❌ Failed to get repository status", err=True)
+        return [], [], False
+    
+    staged, unstaged = [], []
+    entries = iter(stdout.split("\0"))
+    for entry in entries:
+        if not entry:
+            continue
+        kind = entry[0]
+        if kind == "1":
+            fields = entry.split(" ", 8)
+        elif kind == "2":
+            fields = entry.split(" ", 9)
+            next(entries, None)  # Skip the original path of a rename/copy
+        elif kind == "u":
+            fields = entry.split(" ", 10)
+        else:
+            # Untracked ("?"), ignored ("!") and header ("#") entries
+            continue
+        
+        status, path = fields[1], fields[-1]
+        if status[0] != ".":
+            staged.append(path)
+        if status[1] != ".":
+            unstaged.append(path)
+    
+    click.echo(f"✓ Found {len(staged)} staged and {len(unstaged)} unstaged files")
+    _repo_status = (tuple(staged), tuple(unstaged))
+    return staged, unstaged, True
+
+@dataclass
+class RepoSession:
+    """Repository state gathered once and shared for the rest of a CLI run"""
+    root: Optional[Path]  # None when the repository was only found by git itself
+    staged: List[str] = field(default_factory=list)
+    unstaged: List[str] = field(default_factory=list)
+    diff: Optional[str] = None
+
+    @classmethod
+    def discover(cls, max_length: int = 3000) -> Optional["RepoSession"]:
+        """
+        Collect file status and the staged diff with two git calls
+        
+        Args:
+            max_length: Maximum length of the simplified diff
+        
+        Returns:
+            The session or None if not inside a git repository
+        """
+        staged, unstaged, is_repo = collect_repo_state()
+        if not is_repo:
+            return None
+        diff = get_git_diff(staged=True, max_length=max_length) if staged else None
+        return cls(
+            root=_find_git_root(os.path.abspath(os.getcwd())),
+            staged=staged,
+            unstaged=unstaged,
+            diff=diff
+        )
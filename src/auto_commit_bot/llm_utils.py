@@ -1,13 +1,45 @@
 """
 LLM integration utilities for Auto Commit Bot using Hugging Face models
 """
+import copy
+import hashlib
+import importlib.util
+import json
+import logging
 import os
-import re
-from typing import Optional
+import shelve
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+from typing import Dict, List, Optional
 import requests
 import click
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
-from .config import config
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from .config import get_config
+
+try:
+    import orjson
+except ImportError:  # optional, the standard library json is used instead
+    orjson = None
+
+
+def _json_dumps(obj) -> bytes:
+    """Serialize obj to UTF-8 JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+# Both accept bytes, so SSE lines are parsed without decoding them first
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+# Progress output goes to debug logging, shown by `auto-commit --verbose`;
+# errors and warnings use click.echo directly
+logger = logging.getLogger(__name__)
+
 
 # Valid commit types for filtering
 VALID_COMMIT_TYPES = [
@@ -15,6 +47,9 @@ VALID_COMMIT_TYPES = [
     "perf", "test", "chore", "revert", "build", "ci"
 ]
 
+# "<type>:", "<type>(scope):" or "<type>!:", so words like "feature" don't pass as "feat"
+_VALID_PREFIXES = tuple(t + c for t in VALID_COMMIT_TYPES for c in (":", "(", "!"))
+
 DEFAULT_PROMPT_TEMPLATE = """
 You are a commit message generator that follows the Conventional Commits specification and best practices for Git commit messages.
 
@@ -56,42 +91,308 @@ feat(api): implement user authentication
 </commit>
 """
 
+# Static pieces of the default template, split once so building a prompt is plain concatenation
+_PROMPT_HEAD, _, _PROMPT_REST = DEFAULT_PROMPT_TEMPLATE.partition("{format_type}")
+_PROMPT_MIDDLE, _, _PROMPT_TAIL = _PROMPT_REST.partition("{diff}")
+# Everything before the diff only depends on the format type
+_PROMPT_PREFIXES = {
+    format_type: _PROMPT_HEAD + format_type + _PROMPT_MIDDLE
+    for format_type in ("short", "detailed")
+}
+
+
+def _prompt_prefix(format_type: str) -> str:
+    """Return the part of the default prompt that comes before the diff"""
+    return _PROMPT_PREFIXES.get(format_type) or _PROMPT_HEAD + format_type + _PROMPT_MIDDLE
+
+# (connect, read) timeouts in seconds for API requests
+_API_TIMEOUT = (3.05, 30)
+
+# Pooled connections per host, also the number of concurrent batch requests
+_API_POOL_SIZE = 4
+
+# Cached commit messages expire after a week
+_CACHE_TTL = 7 * 24 * 3600
+
+# shelve does not support concurrent writers, batch generation shares this lock
+_CACHE_LOCK = threading.Lock()
+# Entries kept before a store prunes the cache back to half this size
+_CACHE_MAX_ENTRIES = 1000
+
+# Diffs longer than this many lines are cut before prompting
+_MAX_DIFF_LINES = 100
+# A commit subject is far shorter; every extra token is another forward pass
+_MAX_NEW_TOKENS = 96
+# Prompts per local generate call; sorted by length so padding stays small
+_LOCAL_BATCH_SIZE = 4
+# Changes touching only these files get a fixed message instead of an LLM call
+_DOC_SUFFIXES = (".md", ".rst")
+_DEPENDENCY_FILES = frozenset([
+    "requirements.txt", "pyproject.toml", "poetry.lock", "uv.lock", "Pipfile.lock",
+    "package.json", "package-lock.json", "yarn.lock", "pnpm-lock.yaml"
+])
+# Exported and quantized ONNX models, one directory per model
+_ONNX_CACHE_DIR = "~/.cache/auto-commit-bot/onnx"
+
+def _truncate_lines(text: str, max_lines: int) -> str:
+    """
+    Keep the first max_lines lines of text.
+    
+    Scans with str.find, so only the kept part of the text is visited instead
+    of splitting the whole text into a list of lines.
+    
+    Args:
+        text (str): Text to truncate
+        max_lines (int): Maximum number of lines to keep
+    
+    Returns:
+        str: The truncated text, or text itself if it is short enough
+    """
+    end = -1
+    for _ in range(max_lines):
+        end = text.find("\n", end + 1)
+        if end == -1:
+            return text
+    # A trailing newline after the last kept line is not another line
+    return text if end == len(text) - 1 else text[:end]
+
+def _prune_cache(cache, now: float):
+    """
+    Drop expired entries, then the oldest ones, until the cache is at half its cap.
+    
+    Pruning to half leaves room for many stores before the next full scan.
+    
+    Args:
+        cache: Open shelve of key -> (timestamp, message)
+        now (float): Current time from time.time()
+    """
+    entries = sorted((stored, key) for key, (stored, _) in cache.items())
+    excess = len(entries) - _CACHE_MAX_ENTRIES // 2
+    for stored, key in entries:
+        if excess <= 0 and now - stored < _CACHE_TTL:
+            break
+        del cache[key]
+        excess -= 1
+
+
+def _extract_commit_tag(text: str) -> Optional[str]:
+    """
+    Return the text between <commit> and </commit>, or None if there is no opening tag.
+
+    A missing closing tag takes the rest of the text, since generation may stop
+    right before emitting it.
+
+    Args:
+        text (str): Generated text
+
+    Returns:
+        Optional[str]: Stripped text inside the tags
+    """
+    start = text.find("<commit>")
+    if start == -1:
+        return None
+    start += len("<commit>")
+    end = text.find("</commit>", start)
+    return (text[start:] if end == -1 else text[start:end]).strip()
+
+
+def rule_based_message(files: List[str]) -> Optional[str]:
+    """
+    Build a commit message without the LLM when the changed files make it obvious.
+    
+    Args:
+        files (List[str]): Changed file paths, relative to the repository root
+    
+    Returns:
+        Optional[str]: The commit message, or None if no rule matches all files
+    """
+    paths = [PurePosixPath(f) for f in files]
+    if all(p.suffix.lower() in _DOC_SUFFIXES or p.parts[0] == "docs" for p in paths):
+        return "docs: update documentation"
+    if all("tests" in p.parts[:-1] or p.name.startswith("test_") for p in paths):
+        return "test: update tests"
+    if all(p.name in _DEPENDENCY_FILES for p in paths):
+        return "chore(deps): update dependencies"
+    return None
+
+
+def _quantization_kwargs(quantization: Optional[str]) -> Dict:
+    """
+    Build from_pretrained arguments for the configured weight quantization.
+    
+    Args:
+        quantization (str): 'int8', 'int4' or None for full precision
+    
+    Returns:
+        Dict: Extra keyword arguments for AutoModelForCausalLM.from_pretrained
+    """
+    if quantization not in ("int8", "int4"):
+        return {}
+    
+    import torch
+    from transformers import BitsAndBytesConfig
+    if not torch.cuda.is_available() or not all(
+        importlib.util.find_spec(name) for name in ("bitsandbytes", "accelerate")
+    ):
+        # int8 is the default, so this is expected on CPU-only machines
+        logger.debug("ℹ️ Quantization needs a CUDA GPU, bitsandbytes and accelerate, "
+                     "loading unquantized weights")
+        return {}
+    
+    if quantization == "int8":
+        bnb_config = BitsAndBytesConfig(load_in_8bit=True)
+    else:
+        bnb_config = BitsAndBytesConfig(
+            load_in_4bit=True,
+            bnb_4bit_quant_type="nf4",
+            bnb_4bit_compute_dtype=torch.bfloat16
+        )
+    logger.debug(f"✓ Loading {quantization} quantized weights")
+    return {"quantization_config": bnb_config, "device_map": "auto"}
+
+def _load_onnx_model(model_name: str):
+    """
+    Load a local model with ONNX Runtime, exporting it on first use.
+    
+    The first load exports the model to ONNX and quantizes it to INT8 for
+    CPU inference; later loads read the quantized copy from _ONNX_CACHE_DIR.
+    
+    Args:
+        model_name (str): Hugging Face model id or local model path
+    
+    Returns:
+        ORTModelForCausalLM: The quantized model, or None if it cannot be exported or loaded
+    """
+    if not all(importlib.util.find_spec(name) for name in ("optimum", "onnxruntime")):
+        click.echo("⚠️ The onnx backend needs optimum and onnxruntime, using PyTorch instead")
+        return None
+    
+    from optimum.onnxruntime import ORTModelForCausalLM, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    cache_dir = os.path.join(os.path.expanduser(_ONNX_CACHE_DIR), model_name.replace("/", "--"))
+    int8_dir = os.path.join(cache_dir, "int8")
+    try:
+        if not os.path.isdir(int8_dir):
+            click.echo(f"🔧 Exporting {model_name} to ONNX, this only happens once...")
+            os.makedirs(cache_dir, exist_ok=True)
+            # Build in a scratch directory so a failed or interrupted export never looks finished
+            with tempfile.TemporaryDirectory(dir=cache_dir) as tmp_dir:
+                export_dir = os.path.join(tmp_dir, "export")
+                ORTModelForCausalLM.from_pretrained(model_name, export=True).save_pretrained(export_dir)
+                ORTQuantizer.from_pretrained(export_dir).quantize(
+                    save_dir=os.path.join(tmp_dir, "int8"),
+                    quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False)
+                )
+                os.replace(os.path.join(tmp_dir, "int8"), int8_dir)
+        logger.debug("✓ Loading INT8 ONNX model")
+        return ORTModelForCausalLM.from_pretrained(int8_dir)
+    except Exception as e:
+        click.echo(f"⚠️ Could not load the ONNX model, using PyTorch instead: {str(e)}", err=True)
+        return None
+
+def _precision_kwargs() -> Dict:
+    """
+    Pick the compute dtype for unquantized weights.
+    
+    Decoding at batch size 1 is bound by memory bandwidth, so half precision
+    weights on a GPU nearly double tokens per second.
+    
+    Returns:
+        Dict: torch_dtype for AutoModelForCausalLM.from_pretrained
+    """
+    import torch
+    if not torch.cuda.is_available():
+        return {"torch_dtype": torch.float32}
+    # bfloat16 on Ampere and newer, float16 on older GPUs
+    dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+    return {"torch_dtype": dtype}
+
 class LLMProvider:
     def __init__(self):
-        click.echo("\n🤖 Initializing LLM Provider...")
+        logger.debug("\n🤖 Initializing LLM Provider...")
+        config = get_config()
         self.provider_type = config.get("provider_type", "api")
-        click.echo(f"✓ Using provider type: {self.provider_type}")
+        logger.debug(f"✓ Using provider type: {self.provider_type}")
+        cache_file = config.get("cache_file")
+        self.cache_file = os.path.expanduser(cache_file) if cache_file else None
         self._setup_provider()
 
     def _setup_provider(self):
         """Setup the selected LLM provider"""
+        config = get_config()
         if self.provider_type == "api":
-            click.echo("🌐 Setting up API provider...")
+            logger.debug("🌐 Setting up API provider...")
             self.api_url = config.get("api_url")
             self.model = config.get("api_model_name")
+            self.model_name = self.model
             api_key = config.get("huggingface_api_key")
             if not api_key:
                 click.echo("❌ Error: No Hugging Face API key found", err=True)
                 click.echo("Please set your API key using:")
                 click.echo("  auto-commit configure --api-key YOUR_API_KEY")
                 raise ValueError("Missing API key")
-            self.headers = {"Authorization": f"Bearer {api_key}"}
-            click.echo(f"✓ API configured for model: {self.model}")
+            self.headers = {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            }
+            # Reuse one keep-alive connection and retry transient failures
+            retry = Retry(
+                total=2,
+                backoff_factor=0.3,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=frozenset({"POST"}),
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(
+                pool_connections=_API_POOL_SIZE,
+                pool_maxsize=_API_POOL_SIZE,
+                max_retries=retry
+            )
+            self.session = requests.Session()
+            self.session.mount("https://", adapter)
+            self.session.headers.update(self.headers)
+            logger.debug(f"✓ API configured for model: {self.model}")
         else:
-            click.echo("💻 Setting up local provider...")
+            logger.debug("💻 Setting up local provider...")
+            # Imported here so the API provider never pays for loading transformers/torch
+            from transformers import AutoTokenizer
             model_name = config.get("local_model_name")
-            click.echo("📥 Loading tokenizer...")
-            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-            click.echo("📥 Loading model...")
-            self.model = AutoModelForCausalLM.from_pretrained(model_name)
-            click.echo("🔧 Setting up pipeline...")
-            self.pipeline = pipeline(
-                "text-generation",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                max_length=128
-            )
-            click.echo(f"✓ Local model setup complete: {model_name}")
+            self.model_name = model_name
+            logger.debug("📥 Loading tokenizer...")
+            self.tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+            # The template around the diff is tokenized once, not on every prompt
+            self._prefix_ids = {}
+            self._suffix_ids = self.tokenizer.encode(_PROMPT_TAIL, add_special_tokens=False)
+            # Attention keys/values of the template prefix, or None once a model rejects them
+            self._prefix_caches = {}
+            logger.debug("📥 Loading model...")
+            self.model = None
+            if config.get("local_backend") == "onnx":
+                self.model = _load_onnx_model(model_name)
+                if self.model is not None:
+                    # ONNX Runtime sessions take no PyTorch key/value cache objects
+                    self._prefix_caches = None
+            if self.model is None:
+                self._load_torch_model(model_name, config)
+            logger.debug(f"✓ Local model setup complete: {model_name}")
+
+    def _load_torch_model(self, model_name: str, config):
+        """Load the local model with PyTorch, quantized or in the device's best precision"""
+        import torch
+        from transformers import AutoModelForCausalLM
+        quantization_kwargs = _quantization_kwargs(config.get("quantization"))
+        self.model = AutoModelForCausalLM.from_pretrained(
+            model_name,
+            **(quantization_kwargs or _precision_kwargs())
+        )
+        # Quantized weights are already placed by device_map
+        if not quantization_kwargs:
+            self.model.to("cuda" if torch.cuda.is_available() else "cpu")
+        self.model.eval()
+        if config.get("torch_compile"):
+            # Compilation takes longer than a single generation, so it is opt-in
+            logger.debug("🔧 Compiling model...")
+            self.model.forward = torch.compile(self.model.forward, mode="reduce-overhead")
 
     def _clean_commit_message(self, message: str, format_type: str = "short") -> str:
         """
@@ -105,61 +406,94 @@ class LLMProvider:
             str: Cleaned commit message
         """
         # Try to extract message between tags first
-        match = re.search(r"<commit>(.*?)</commit>", message, re.DOTALL)
-        if match:
-            message = match.group(1).strip()
+        tagged = _extract_commit_tag(message)
+        if tagged is not None:
+            message = tagged
 
-        # Split into lines and process
-        lines = message.splitlines()
-        lines = [line.strip() for line in lines if line.strip()]
+        # Strip each line once and skip blank ones lazily
+        lines = (line for line in (raw.strip() for raw in message.splitlines()) if line)
+        
+        if format_type == "short":
+            # Only the subject is needed, so stop at the first valid line
+            first_line = next(lines, "")
+            if first_line.startswith(_VALID_PREFIXES):
+                return first_line
+            return next((line for line in lines if line.startswith(_VALID_PREFIXES)), first_line)
         
+        lines = list(lines)
         if not lines:
             return ""
             
         # Validate first line follows conventional commit format
         first_line = lines[0]
-        if not any(first_line.startswith(t) for t in VALID_COMMIT_TYPES):
+        if not first_line.startswith(_VALID_PREFIXES):
             # Try to find a valid commit message in other lines
             for line in lines[1:]:
-                if any(line.startswith(t) for t in VALID_COMMIT_TYPES):
+                if line.startswith(_VALID_PREFIXES):
                     first_line = line
                     break
         
-        if format_type == "short":
-            return first_line
-            
         # For detailed format, include body and footer if present
         result = [first_line]
-        if len(lines) > 1:
-            current_section = []
-            for line in lines[1:]:
-                # Skip lines that look like new commit messages
-                if any(line.startswith(t) for t in VALID_COMMIT_TYPES):
-                    continue
-                current_section.append(line)
-            
-            if current_section:
-                result.extend([""] + current_section)
+        # Skip lines that look like new commit messages
+        current_section = [line for line in lines[1:] if not line.startswith(_VALID_PREFIXES)]
+        if current_section:
+            result.extend([""] + current_section)
         
         return "\n".join(result)
 
     def _generate_prompt(self, diff: str, format_type: str = "short") -> str:
         """Generate prompt with appropriate format type and template."""
-        detailed_format = """
-Header: <type>(<scope>): <subject>
-[blank line]
-Body: Detailed explanation of changes
-[blank line]
-Footer: Issue references, breaking changes
-"""
-        short_format = "<type>(<scope>): <subject>"
+        return _prompt_prefix(format_type) + diff + _PROMPT_TAIL
+
+    def _prompt_ids(self, diff: str, format_type: str = "short") -> List[int]:
+        """
+        Tokenize the prompt for a diff, reusing the token ids of the template.
         
-        template = DEFAULT_PROMPT_TEMPLATE.format(
-            diff=diff,
-            format_type=format_type,
-            detailed_format=detailed_format if format_type == "detailed" else short_format
-        )
-        return template
+        Only the diff is encoded per call. When the prompt is too long, the
+        diff is cut so the instructions after it are kept.
+        
+        Args:
+            diff (str): The git diff content
+            format_type (str): The commit message format type ('short' or 'detailed')
+        
+        Returns:
+            List[int]: Token ids of the full prompt
+        """
+        prefix_ids = self._prefix_token_ids(format_type)
+        budget = max(self._max_prompt_tokens() - len(prefix_ids) - len(self._suffix_ids), 0)
+        diff_ids = self.tokenizer.encode(diff, add_special_tokens=False)[:budget]
+        return prefix_ids + diff_ids + self._suffix_ids
+
+    def _prefix_token_ids(self, format_type: str) -> List[int]:
+        """Return the token ids of the prompt before the diff, encoding them once"""
+        prefix_ids = self._prefix_ids.get(format_type)
+        if prefix_ids is None:
+            prefix_ids = self._prefix_ids[format_type] = self.tokenizer.encode(_prompt_prefix(format_type))
+        return prefix_ids
+
+    def _prefix_cache(self, format_type: str):
+        """
+        Return the key/value cache of the prompt before the diff, computing it once.
+        
+        Every local prompt starts with these exact token ids, so generate can
+        skip attention over the prefix when handed a copy of this cache.
+        
+        Args:
+            format_type (str): The commit message format type ('short' or 'detailed')
+        
+        Returns:
+            DynamicCache: Cache covering the prompt prefix
+        """
+        cache = self._prefix_caches.get(format_type)
+        if cache is None:
+            import torch
+            from transformers import DynamicCache
+            prefix_ids = torch.tensor([self._prefix_token_ids(format_type)], device=self.model.device)
+            with torch.no_grad():
+                cache = self.model(prefix_ids, past_key_values=DynamicCache(), use_cache=True).past_key_values
+            self._prefix_caches[format_type] = cache
+        return cache
 
     def generate_commit_message(self, diff: str, format_type: str = "short") -> str:
         """
@@ -172,24 +506,88 @@ Footer: Issue references, breaking changes
         Returns:
             str: Generated commit message
         """
-        click.echo("\n📝 Generating commit message...")
-        click.echo(f"✓ Using {format_type} format")
+        logger.debug("\n📝 Generating commit message...")
+        logger.debug(f"✓ Using {format_type} format")
         
-        if len(diff.splitlines()) > 100:
-            diff = "\n".join(diff.splitlines()[:100])
+        truncated = _truncate_lines(diff, _MAX_DIFF_LINES)
+        if len(truncated) < len(diff):
+            diff = truncated
             click.echo("⚠️ Warning: Large diff detected, using simplified version")
         
-        prompt = self._generate_prompt(diff, format_type)
-        click.echo("✓ Prompt template prepared")
+        # Key on the diff the model actually sees, after truncation
+        cache_key = hashlib.sha256(f"{self.model_name}|{format_type}|{diff}".encode()).hexdigest()
+        cached = self._get_cached_message(cache_key)
+        if cached:
+            logger.debug("✓ Using cached commit message")
+            return cached
         
         if self.provider_type == "api":
-            return self._generate_api(prompt, format_type)
+            prompt = self._generate_prompt(diff, format_type)
+            logger.debug("✓ Prompt template prepared")
+            message = self._generate_api(prompt, format_type)
         else:
-            return self._generate_local(prompt)
+            message = self._generate_local(diff, format_type)
+        
+        if message:
+            self._cache_message(cache_key, message)
+        return message
+
+    def _get_cached_message(self, key: str) -> Optional[str]:
+        """Return a previously generated message for this key if it has not expired"""
+        if not self.cache_file:
+            return None
+        try:
+            with _CACHE_LOCK, shelve.open(self.cache_file) as cache:
+                entry = cache.get(key)
+                if entry and time.time() - entry[0] >= _CACHE_TTL:
+                    del cache[key]
+                    entry = None
+        except Exception as e:
+            click.echo(f"⚠️ Could not read message cache: {str(e)}", err=True)
+            return None
+        
+        return entry[1] if entry else None
+
+    def _cache_message(self, key: str, message: str):
+        """Store a generated message, pruning the cache once it outgrows its cap"""
+        if not self.cache_file:
+            return
+        try:
+            now = time.time()
+            with _CACHE_LOCK, shelve.open(self.cache_file) as cache:
+                cache[key] = (now, message)
+                # Pruning unpickles every entry, so it only runs when the cap is exceeded
+                if len(cache) > _CACHE_MAX_ENTRIES:
+                    _prune_cache(cache, now)
+        except Exception as e:
+            click.echo(f"⚠️ Could not write message cache: {str(e)}", err=True)
+
+    def generate_commit_messages(self, diffs: List[str], format_type: str = "short") -> List[str]:
+        """
+        Generate commit messages for several diffs.
+        
+        API requests are I/O-bound, so they are sent concurrently over the
+        pooled session; the local provider batches prompts into shared
+        generate calls.
+        
+        Args:
+            diffs (List[str]): The git diff content for each message
+            format_type (str): The commit message format type ('short' or 'detailed')
+        
+        Returns:
+            List[str]: Generated commit messages, in the order of diffs
+        """
+        if len(diffs) < 2:
+            return [self.generate_commit_message(diff, format_type) for diff in diffs]
+        if self.provider_type == "local":
+            return self._generate_local_batch(diffs, format_type)
+        
+        with ThreadPoolExecutor(max_workers=min(_API_POOL_SIZE, len(diffs))) as executor:
+            return list(executor.map(lambda diff: self.generate_commit_message(diff, format_type), diffs))
 
     def _generate_api(self, prompt: str, format_type: str = "short") -> str:
         """Generate commit message using Hugging Face API"""
-        click.echo("🌐 Sending request to Hugging Face API...")
+        logger.debug("🌐 Sending request to Hugging Face API...")
         try:
             payload = {
                 "messages": [
@@ -203,83 +601,196 @@ Footer: Issue references, breaking changes
                     }
                 ],
                 "max_tokens": 500,
-                "model": self.model
+                "model": self.model,
+                # Stream so the answer can be cut off as soon as the commit tag closes
+                "stream": True,
+                "stop": ["</commit>"]
             }
             
-            response = requests.post(
+            response = self.session.post(
                 self.api_url,
-                headers=self.headers,
-                json=payload
+                data=_json_dumps(payload),
+                timeout=_API_TIMEOUT,
+                stream=True
             )
-            
-            if response.status_code == 422:
-                click.echo("❌ Error: Input too large for the model", err=True)
-                click.echo("\n💡 Suggestions to fix this:")
-                click.echo("1. Use 'git add' to stage only specific files")
-                click.echo("2. Make smaller, focused commits")
-                click.echo("3. Try using 'git diff --unified=0' for minimal context")
-                return ""
-            elif response.status_code != 200:
-                click.echo(f"❌ API request failed with status {response.status_code}", err=True)
-                click.echo(f"Error details: {response.text}", err=True)
-                return ""
-                
-            click.echo("✓ Received API response")
-            result = response.json()
-            
-            if "choices" in result and len(result["choices"]) > 0:
-                raw_message = result["choices"][0]["message"]["content"].strip()
-                if raw_message:
-                    click.echo("✓ Successfully extracted message from API response")
-                    return self._clean_commit_message(raw_message, format_type)
-                else:
-                    click.echo("❌ Empty response from API", err=True)
-                    return ""
-            else:
-                click.echo("❌ Unexpected API response format", err=True)
-                click.echo("Response:", result)
-                return ""
+            with response:
+                return self._read_api_response(response, format_type)
                 
         except Exception as e:
             click.echo(f"❌ API request error: {str(e)}", err=True)
             return ""
 
-    def _generate_local(self, prompt: str) -> str:
+    def _read_api_response(self, response: requests.Response, format_type: str = "short") -> str:
+        """
+        Read a streamed chat completion and clean the commit message in it.
+        
+        Server-sent event frames are read until the stream ends or the closing
+        commit tag arrives, so trailing explanations are never downloaded.
+        
+        Args:
+            response (requests.Response): Streaming response from the API
+            format_type (str): Format type ('short' or 'detailed')
+            
+        Returns:
+            str: Cleaned commit message, or an empty string on failure
+        """
+        if response.status_code == 422:
+            click.echo("❌ Error: Input too large for the model", err=True)
+            click.echo("\n💡 Suggestions to fix this:")
+            click.echo("1. Use 'git add' to stage only specific files")
+            click.echo("2. Make smaller, focused commits")
+            click.echo("3. Try using 'git diff --unified=0' for minimal context")
+            return ""
+        elif response.status_code != 200:
+            click.echo(f"❌ API request failed with status {response.status_code}", err=True)
+            click.echo(f"Error details: {response.text}", err=True)
+            return ""
+
+        logger.debug("✓ Receiving API response")
+        raw_message = ""
+        # Lines are bytes: SSE has no charset header, so requests would guess latin-1
+        for line in response.iter_lines():
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+            choices = _json_loads(data).get("choices")
+            if not choices:
+                continue
+            content = choices[0].get("delta", {}).get("content") or ""
+            # Only the new text and the tag length before it can complete the tag
+            search_from = max(len(raw_message) - len("</commit>"), 0)
+            raw_message += content
+            if raw_message.find("</commit>", search_from) != -1:
+                break
+        
+        raw_message = raw_message.strip()
+        if not raw_message:
+            click.echo("❌ Empty response from API", err=True)
+            return ""
+        logger.debug("✓ Successfully extracted message from API response")
+        return self._clean_commit_message(raw_message, format_type)
+
+    def _generate_local(self, diff: str, format_type: str = "short") -> str:
         """Generate commit message using local model"""
-        click.echo("💭 Generating with local model...")
-        result = self.pipeline(
-            prompt,
-            max_length=2048,
-            num_return_sequences=1,
-            pad_token_id=self.tokenizer.eos_token_id,
-            truncation=True,
-            do_sample=True,
-            temperature=0.7,
-            top_p=0.95,
-            top_k=50
-        )
-        click.echo("✓ Local generation complete")
+        import torch
+        logger.debug("💭 Generating with local model...")
+        input_ids = torch.tensor([self._prompt_ids(diff, format_type)], device=self.model.device)
+        inputs = {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+        output = None
+        if self._prefix_caches is not None:
+            try:
+                # generate extends the cache in place, so the stored prefix needs a copy
+                past_key_values = copy.deepcopy(self._prefix_cache(format_type))
+                output = self.model.generate(**inputs, past_key_values=past_key_values, **self._generation_kwargs())
+            except Exception as e:
+                click.echo(f"⚠️ Prompt cache not supported by this model, disabling it: {str(e)}", err=True)
+                self._prefix_caches = None
+        if output is None:
+            output = self.model.generate(**inputs, **self._generation_kwargs())
+        logger.debug("✓ Local generation complete")
         
-        # Extract the generated text
-        generated_text = result[0]["generated_text"].strip()
+        # Decode only the new tokens; the prompt itself contains an example <commit> block
+        prompt_length = input_ids.shape[1]
+        generated_text = self.tokenizer.decode(output[0][prompt_length:], skip_special_tokens=True).strip()
         
         # Try to extract message between commit tags
-        match = re.search(r"<commit>\s*(.*?)\s*</commit>", generated_text, re.DOTALL)
-        if match:
-            message = match.group(1).strip()
-            if message and any(message.startswith(t) for t in VALID_COMMIT_TYPES):
-                click.echo("✓ Successfully extracted commit message from tags")
+        message = _extract_commit_tag(generated_text)
+        if message is not None:
+            if message and message.startswith(_VALID_PREFIXES):
+                logger.debug("✓ Successfully extracted commit message from tags")
                 return message
             
         # If no valid message found in tags, try to find a conventional commit format message
         lines = generated_text.splitlines()
         for line in lines:
             line = line.strip()
-            if line and any(line.startswith(t) for t in VALID_COMMIT_TYPES):
-                click.echo("✓ Found valid commit message format")
+            if line and line.startswith(_VALID_PREFIXES):
+                logger.debug("✓ Found valid commit message format")
                 return line
                 
         click.echo("❌ Could not find valid commit message in generated text", err=True)
         click.echo("Generated text for debugging:")
         click.echo(generated_text)
-        return "" 
\ No newline at end of file
+        return "" 
+
+    def _max_prompt_tokens(self) -> int:
+        """Return how many prompt tokens fit next to the generation budget"""
+        # model_max_length is a huge sentinel for tokenizers without a known limit
+        return min(self.tokenizer.model_max_length, 2048) - _MAX_NEW_TOKENS
+
+    def _generation_kwargs(self) -> Dict:
+        """Return the sampling settings shared by single and batched local generation"""
+        return {
+            "max_new_tokens": _MAX_NEW_TOKENS,
+            "stop_strings": ["</commit>"],
+            "tokenizer": self.tokenizer,
+            "pad_token_id": self.tokenizer.eos_token_id,
+            "do_sample": True,
+            "temperature": 0.7,
+            "top_p": 0.95,
+            "top_k": 50,
+        }
+
+    def _generate_local_batch(self, diffs: List[str], format_type: str = "short") -> List[str]:
+        """
+        Generate commit messages for several diffs with batched local generation.
+        
+        Prompts are sorted by length and grouped so each generate call pads
+        as little as possible. Cached messages are reused as in
+        generate_commit_message.
+        
+        Args:
+            diffs (List[str]): The git diff content for each message
+            format_type (str): The commit message format type ('short' or 'detailed')
+        
+        Returns:
+            List[str]: Generated commit messages, in the order of diffs
+        """
+        logger.debug(f"\n📝 Generating {len(diffs)} commit messages...")
+        messages = [""] * len(diffs)
+        keys = []
+        prompt_ids = {}
+        for index, diff in enumerate(diffs):
+            diff = _truncate_lines(diff, _MAX_DIFF_LINES)
+            keys.append(hashlib.sha256(f"{self.model_name}|{format_type}|{diff}".encode()).hexdigest())
+            cached = self._get_cached_message(keys[index])
+            if cached:
+                messages[index] = cached
+            else:
+                prompt_ids[index] = self._prompt_ids(diff, format_type)
+        
+        if not prompt_ids:
+            logger.debug("✓ Using cached commit messages")
+            return messages
+        
+        # Decoder-only models continue from the last token, so pad on the left
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.tokenizer.padding_side = "left"
+        
+        order = sorted(prompt_ids, key=lambda index: len(prompt_ids[index]))
+        logger.debug("💭 Generating with local model...")
+        for start in range(0, len(order), _LOCAL_BATCH_SIZE):
+            batch = order[start:start + _LOCAL_BATCH_SIZE]
+            inputs = self.tokenizer.pad(
+                {"input_ids": [prompt_ids[index] for index in batch]},
+                return_tensors="pt"
+            ).to(self.model.device)
+            output = self.model.generate(**inputs, **self._generation_kwargs())
+            
+            # Left padding gives every row the same prompt length
+            prompt_length = inputs["input_ids"].shape[1]
+            texts = self.tokenizer.batch_decode(output[:, prompt_length:], skip_special_tokens=True)
+            for index, text in zip(batch, texts):
+                message = self._clean_commit_message(text, format_type)
+                # Same rule as _generate_local: without a commit type it is not a message
+                if not message.startswith(_VALID_PREFIXES):
+                    click.echo(f"❌ Could not find valid commit message for diff {index + 1}", err=True)
+                    continue
+                messages[index] = message
+                self._cache_message(keys[index], message)
+        
+        logger.debug("✓ Local generation complete")
+        return messages
@@ -1,9 +1,11 @@
 """
 Tests for the CLI module
 """
+import logging
 import pytest
 from click.testing import CliRunner
 from auto_commit_bot.cli import cli, commit, configure
+from auto_commit_bot.git_utils import RepoSession
 
 @pytest.fixture
 def runner():
@@ -14,8 +16,8 @@ def runner():
 def mock_git_utils(mocker):
     """Mock git utilities"""
     mocker.patch("auto_commit_bot.cli.is_git_repo", return_value=True)
-    mocker.patch("auto_commit_bot.cli.has_staged_changes", return_value=True)
-    mocker.patch("auto_commit_bot.cli.get_git_diff", return_value="test diff")
+    mocker.patch("auto_commit_bot.cli.RepoSession.discover",
+                 return_value=RepoSession(root=None, staged=["file1.py"], diff="test diff"))
     mocker.patch("auto_commit_bot.cli.stage_all_changes", return_value=True)
     mocker.patch("auto_commit_bot.cli.commit_changes", return_value=True)
     return mocker
@@ -29,8 +31,9 @@ def mock_llm_provider(mocker):
 
 def test_commit_success(runner, mock_git_utils, mock_llm_provider):
     """Test successful commit command"""
-    mock_git_utils.patch("auto_commit_bot.cli.get_changed_files",
-                        return_value=["file1.py", "file2.py"])
+    mock_git_utils.patch("auto_commit_bot.cli.RepoSession.discover",
+                        return_value=RepoSession(root=None, staged=["file1.py", "file2.py"],
+                                                 diff="test diff"))
     result = runner.invoke(cli, ["commit"])
     
     assert result.exit_code == 0
@@ -40,6 +43,16 @@ def test_commit_success(runner, mock_git_utils, mock_llm_provider):
     assert "feat(test): add new feature" in result.output
     assert "✅ Changes committed successfully!" in result.output
 
+def test_commit_rule_based_skips_provider(runner, mock_git_utils, mock_llm_provider):
+    """Test docs-only commits are named without building an LLM provider"""
+    mock_git_utils.patch("auto_commit_bot.cli.RepoSession.discover",
+                        return_value=RepoSession(root=None, staged=["README.md"], diff="test diff"))
+    result = runner.invoke(cli, ["commit"])
+    
+    assert result.exit_code == 0
+    assert "docs: update documentation" in result.output
+    mock_llm_provider.assert_not_called()
+
 def test_commit_not_git_repo(runner, mock_git_utils, mock_llm_provider):
     """Test commit in non-git repository"""
     mock_git_utils.patch("auto_commit_bot.cli.is_git_repo", return_value=False)
@@ -50,7 +63,8 @@ def test_commit_not_git_repo(runner, mock_git_utils, mock_llm_provider):
 
 def test_commit_no_staged_changes(runner, mock_git_utils, mock_llm_provider):
     """Test commit with no staged changes"""
-    mock_git_utils.patch("auto_commit_bot.cli.has_staged_changes", return_value=False)
+    mock_git_utils.patch("auto_commit_bot.cli.RepoSession.discover",
+                        return_value=RepoSession(root=None))
     result = runner.invoke(cli, ["commit"])
     
     assert result.exit_code == 1
@@ -66,8 +80,6 @@ def test_commit_stage_all_failure(runner, mock_git_utils, mock_llm_provider):
 
 def test_commit_message_generation_failure(runner, mock_git_utils, mock_llm_provider):
     """Test commit with message generation failure"""
-    mock_git_utils.patch("auto_commit_bot.cli.get_changed_files",
-                        return_value=["file1.py", "file2.py"])
     mock_llm_provider.return_value.generate_commit_message.return_value = None
     result = runner.invoke(cli, ["commit"])
     
@@ -76,8 +88,6 @@ def test_commit_message_generation_failure(runner, mock_git_utils, mock_llm_prov
 
 def test_commit_dry_run(runner, mock_git_utils, mock_llm_provider):
     """Test commit in dry-run mode"""
-    mock_git_utils.patch("auto_commit_bot.cli.get_changed_files",
-                        return_value=["file1.py", "file2.py"])
     result = runner.invoke(cli, ["commit", "--dry-run"])
     
     assert result.exit_code == 0
@@ -85,9 +95,23 @@ def test_commit_dry_run(runner, mock_git_utils, mock_llm_provider):
     assert "feat(test): add new feature" in result.output
     assert "✅ Changes committed successfully!" not in result.output
 
+def test_verbose_enables_debug_logging(runner, mock_git_utils, mock_llm_provider):
+    """Test --verbose turns on debug logging"""
+    result = runner.invoke(cli, ["--verbose", "commit", "--dry-run"])
+    
+    assert result.exit_code == 0
+    assert logging.getLogger("auto_commit_bot").level == logging.DEBUG
+    
+    # Config and LLM progress messages share the package logger
+    assert logging.getLogger("auto_commit_bot.config").isEnabledFor(logging.DEBUG)
+    assert logging.getLogger("auto_commit_bot.llm_utils").isEnabledFor(logging.DEBUG)
+    
+    runner.invoke(cli, ["commit", "--dry-run"])
+    assert logging.getLogger("auto_commit_bot").level == logging.WARNING
+
 def test_configure_provider(runner, mocker):
     """Test configure command with provider"""
-    mock_config = mocker.patch("auto_commit_bot.cli.config")
+    mock_config = mocker.patch("auto_commit_bot.cli.get_config").return_value
     result = runner.invoke(cli, ["configure", "--provider", "api"])
     
     assert result.exit_code == 0
@@ -96,7 +120,7 @@ def test_configure_provider(runner, mocker):
 
 def test_configure_api_key(runner, mocker):
     """Test configure command with API key"""
-    mock_config = mocker.patch("auto_commit_bot.cli.config")
+    mock_config = mocker.patch("auto_commit_bot.cli.get_config").return_value
     result = runner.invoke(cli, [
         "configure",
         "--provider", "api",
@@ -109,7 +133,7 @@ def test_configure_api_key(runner, mocker):
 
 def test_configure_model(runner, mocker):
     """Test configure command with model"""
-    mock_config = mocker.patch("auto_commit_bot.cli.config")
+    mock_config = mocker.patch("auto_commit_bot.cli.get_config").return_value
     result = runner.invoke(cli, [
         "configure",
         "--provider", "api",
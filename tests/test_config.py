@@ -1,11 +1,13 @@
 """
 Tests for the configuration module
 """
+import json
 import os
+import stat
 from pathlib import Path
 import pytest
 import yaml
-from auto_commit_bot.config import Config, DEFAULT_CONFIG
+from auto_commit_bot.config import Config, DEFAULT_CONFIG, get_config
 
 @pytest.fixture
 def temp_config_file(tmp_path):
@@ -44,6 +46,15 @@ def test_load_config_file(config_with_file, temp_config_file):
     # Default values should still be present
     assert config_with_file.get("commit_format") == "conventional"
 
+def test_load_json_config_file(config_with_file, temp_config_file):
+    """Test loading configuration from a JSON file"""
+    temp_config_file.write_text(json.dumps({"provider_type": "local"}))
+    
+    config_with_file._load_config()
+    
+    assert config_with_file.get("provider_type") == "local"
+    assert config_with_file.get("commit_format") == "conventional"
+
 def test_load_env_vars(monkeypatch):
     """Test loading configuration from environment variables"""
     test_api_key = "test-api-key"
@@ -59,11 +70,30 @@ def test_save_config(config_with_file, temp_config_file):
     config_with_file.save()
     
     # Read the saved file
-    with open(temp_config_file) as f:
-        saved_config = yaml.safe_load(f)
+    saved_config = json.loads(temp_config_file.read_text())
     
     assert saved_config["provider_type"] == "local"
     assert saved_config["model_name"] == "test-model"
+    # The temporary file is renamed over the config file
+    assert list(temp_config_file.parent.iterdir()) == [temp_config_file]
+
+def test_save_config_keeps_permissions(config_with_file, temp_config_file):
+    """Test saving keeps the config file private"""
+    temp_config_file.write_text("{}")
+    os.chmod(temp_config_file, 0o600)
+    config_with_file.save()
+    assert stat.S_IMODE(temp_config_file.stat().st_mode) == 0o600
+
+def test_save_config_new_file_is_private(config_with_file, temp_config_file):
+    """Test a newly created config file is only readable by its owner"""
+    config_with_file.save()
+    assert stat.S_IMODE(temp_config_file.stat().st_mode) == 0o600
+
+def test_save_config_removes_temp_file_on_error(config_with_file, temp_config_file, mocker):
+    """Test a failed save leaves no temporary file behind"""
+    mocker.patch("auto_commit_bot.config.os.replace", side_effect=OSError("disk full"))
+    config_with_file.save()
+    assert list(temp_config_file.parent.iterdir()) == []
 
 def test_get_all_config():
     """Test getting all configuration values"""
@@ -72,4 +102,9 @@ def test_get_all_config():
     
     assert isinstance(all_config, dict)
     assert id(all_config) != id(config.config)  # Should be a copy
-    assert all_config["provider_type"] == config.get("provider_type") 
\ No newline at end of file
+    assert all_config["provider_type"] == config.get("provider_type")
+
+def test_get_config_is_shared():
+    """Test get_config returns one lazily created instance"""
+    assert get_config() is get_config()
+    assert isinstance(get_config(), Config)
@@ -4,19 +4,31 @@ Tests for the git utilities module
 import pytest
 from auto_commit_bot.git_utils import (
     run_git_command,
+    simplify_diff,
     get_git_diff,
     stage_all_changes,
     commit_changes,
     is_git_repo,
     has_staged_changes,
-    get_changed_files
+    get_changed_files,
+    collect_repo_state,
+    clear_cache,
+    RepoSession
 )
 
+@pytest.fixture(autouse=True)
+def reset_git_cache():
+    """Start every test without memoized git state"""
+    clear_cache()
+    yield
+    clear_cache()
+
 @pytest.fixture
 def mock_subprocess(mocker):
-    """Mock subprocess.Popen"""
-    mock = mocker.patch("subprocess.Popen")
-    mock.return_value.communicate.return_value = ("output", "error")
+    """Mock subprocess.run"""
+    mock = mocker.patch("subprocess.run")
+    mock.return_value.stdout = "output"
+    mock.return_value.stderr = "error"
     mock.return_value.returncode = 0
     return mock
 
@@ -41,23 +53,69 @@ def test_run_git_command_exception(mock_subprocess):
     assert code == 1
     assert "Command failed" in stderr
 
+def test_simplify_diff():
+    """Test diff simplification drops metadata and keeps changes"""
+    diff = "\n".join([
+        "diff --git a/file.py b/file.py",
+        "index 1234567..89abcde 100644",
+        "--- a/file.py",
+        "+++ b/file.py",
+        "@@ -1 +1 @@",
+        "-old line",
+        "+new line",
+        " context line",
+    ])
+    assert simplify_diff(diff) == "@@ -1 +1 @@\n-old line\n+new line"
+    
+    # Changed lines of CRLF files end in "\r\n"; the CR is not kept
+    crlf = "@@ -1 +1 @@\n-b\r\n+c\r\n"
+    assert simplify_diff(crlf) == "@@ -1 +1 @@\n-b\n+c"
+    assert simplify_diff(crlf.encode()) == b"@@ -1 +1 @@\n-b\n+c"
+
+def test_simplify_diff_truncates():
+    """Test diff simplification stops at max_length"""
+    diff = "\n".join(["+" + "x" * 9] * 100)
+    assert simplify_diff(diff, max_length=25) == "+xxxxxxxxx\n+xxxxxxxxx\n+xx"
+    # Exactly max_length is not truncated
+    assert simplify_diff("+abc\n-def", max_length=9) == "+abc\n-def"
+
+def test_simplify_diff_stops_reading_at_max_length():
+    """Test oversized diffs are not read past max_length"""
+    diff = "\n".join(["+" + "x" * 9] * 100_000)
+    assert simplify_diff(diff, max_length=30) == "+xxxxxxxxx\n+xxxxxxxxx\n+xxxxxxx"
+    assert simplify_diff(diff.encode(), max_length=30) == b"+xxxxxxxxx\n+xxxxxxxxx\n+xxxxxxx"
+
+def test_simplify_diff_bytes():
+    """Test diff simplification works on raw bytes"""
+    diff = b"--- a/file.py\n+++ b/file.py\n@@ -1 +1 @@\n-old\n+new \xe2\x9c\x93"
+    assert simplify_diff(diff) == b"@@ -1 +1 @@\n-old\n+new \xe2\x9c\x93"
+
+def test_simplify_diff_bytes_keeps_whole_characters():
+    """Test bytes truncation does not split a multi-byte character"""
+    diff = "+café\n".encode()
+    # 5 bytes cut after the first byte of "é"
+    assert simplify_diff(diff, 5) == b"+caf"
+    assert simplify_diff(diff, 6) == "+café".encode()
+
 def test_get_git_diff_staged(mocker):
     """Test getting staged git diff"""
     mock_run = mocker.patch("auto_commit_bot.git_utils.run_git_command")
-    mock_run.return_value = ("diff output", "", 0)
+    mock_run.return_value = (b"+diff output", "", 0)
     
     diff = get_git_diff(staged=True)
-    assert diff == "diff output"
-    mock_run.assert_called_with(["git", "diff", "--staged"])
+    assert diff == "+diff output"
+    mock_run.assert_called_with(["git", "diff", "--unified=0", "--no-color", "--no-ext-diff",
+                                 "--no-prefix", "--staged"], text=False)
 
 def test_get_git_diff_unstaged(mocker):
     """Test getting unstaged git diff"""
     mock_run = mocker.patch("auto_commit_bot.git_utils.run_git_command")
-    mock_run.return_value = ("diff output", "", 0)
+    mock_run.return_value = (b"+diff output", "", 0)
     
     diff = get_git_diff(staged=False)
-    assert diff == "diff output"
-    mock_run.assert_called_with(["git", "diff"])
+    assert diff == "+diff output"
+    mock_run.assert_called_with(["git", "diff", "--unified=0", "--no-color", "--no-ext-diff",
+                                 "--no-prefix"], text=False)
 
 def test_stage_all_changes(mocker):
     """Test staging all changes"""
@@ -76,41 +134,139 @@ def test_commit_changes(mocker):
     assert commit_changes(message) is True
     mock_run.assert_called_with(["git", "commit", "-m", message])
 
-def test_is_git_repo(mocker):
+def test_is_git_repo(mocker, tmp_path):
     """Test git repository check"""
     mock_run = mocker.patch("auto_commit_bot.git_utils.run_git_command")
+    mock_run.return_value = ("", "fatal: not a git repository", 128)
     
-    # Test valid git repo
-    mock_run.return_value = ("", "", 0)
-    assert is_git_repo() is True
+    # Test valid git repo, including nested directories
+    repo = tmp_path / "repo"
+    nested = repo / "src" / "pkg"
+    nested.mkdir(parents=True)
+    (repo / ".git").mkdir()
+    assert is_git_repo(str(repo)) is True
+    assert is_git_repo(str(nested)) is True
     
     # Test invalid git repo
-    mock_run.return_value = ("", "", 1)
-    assert is_git_repo() is False
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    assert is_git_repo(str(outside)) is False
+    mock_run.assert_called_once_with(["git", "-C", str(outside), "rev-parse", "--is-inside-work-tree"])
+
+def test_is_git_repo_fallback(mocker, tmp_path):
+    """Test git repository check falls back to git for unusual layouts"""
+    mock_run = mocker.patch("auto_commit_bot.git_utils.run_git_command")
+    mock_run.return_value = ("true", "", 0)
+    assert is_git_repo(str(tmp_path)) is True
+
+def test_is_git_repo_worktree(tmp_path):
+    """Test git repository check with a .git file (worktree/submodule)"""
+    (tmp_path / ".git").write_text("gitdir: /elsewhere/.git/worktrees/wt")
+    assert is_git_repo(str(tmp_path)) is True
+
+def test_is_git_repo_no_subprocess(mocker, tmp_path):
+    """Test git repository check does not spawn git"""
+    mock_run = mocker.patch("auto_commit_bot.git_utils.run_git_command")
+    (tmp_path / ".git").mkdir()
+    assert is_git_repo(str(tmp_path)) is True
+    mock_run.assert_not_called()
 
 def test_has_staged_changes(mocker):
     """Test staged changes check"""
     mock_run = mocker.patch("auto_commit_bot.git_utils.run_git_command")
     
     # Test with staged changes
-    mock_run.return_value = ("file1.py\nfile2.py", "", 0)
+    mock_run.return_value = ("file1.py\0file2.py\0", "", 0)
     assert has_staged_changes() is True
     
     # Test without staged changes
+    clear_cache()
     mock_run.return_value = ("", "", 0)
     assert has_staged_changes() is False
 
+def test_changed_files_are_cached(mocker):
+    """Test staged file queries share one git call until the index changes"""
+    mock_run = mocker.patch("auto_commit_bot.git_utils.run_git_command")
+    mock_run.return_value = ("file1.py", "", 0)
+    
+    assert has_staged_changes() is True
+    assert get_changed_files(staged=True) == ["file1.py"]
+    assert mock_run.call_count == 1
+    
+    # Staging invalidates the cache
+    stage_all_changes()
+    get_changed_files(staged=True)
+    assert mock_run.call_count == 3
+
 def test_get_changed_files(mocker):
     """Test getting changed files"""
     mock_run = mocker.patch("auto_commit_bot.git_utils.run_git_command")
-    mock_run.return_value = ("file1.py\nfile2.py", "", 0)
+    mock_run.return_value = ("file1.py\0file 2.py\0", "", 0)
     
     # Test staged files
     files = get_changed_files(staged=True)
-    assert files == ["file1.py", "file2.py"]
-    mock_run.assert_called_with(["git", "diff", "--name-only", "--staged"])
+    assert files == ["file1.py", "file 2.py"]
+    mock_run.assert_called_with(["git", "diff", "--name-only", "-z", "--staged"])
     
     # Test unstaged files
     files = get_changed_files(staged=False)
-    assert files == ["file1.py", "file2.py"]
-    mock_run.assert_called_with(["git", "diff", "--name-only"]) 
\ No newline at end of file
+    assert files == ["file1.py", "file 2.py"]
+    mock_run.assert_called_with(["git", "diff", "--name-only", "-z"]) 
+
+def test_collect_repo_state(mocker):
+    """Test collecting staged and unstaged files from porcelain v2 status"""
+    mock_run = mocker.patch("auto_commit_bot.git_utils.run_git_command")
+    mock_run.return_value = ("\0".join([
+        "1 M. N... 100644 100644 100644 abc def staged.py",
+        "1 .M N... 100644 100644 100644 abc def unstaged.py",
+        "1 MM N... 100644 100644 100644 abc def both ways.py",
+        "2 R. N... 100644 100644 100644 abc def R100 new.py",
+        "old.py",
+        "? untracked.py",
+    ]) + "\0", "", 0)
+    
+    staged, unstaged, is_repo = collect_repo_state()
+    assert staged == ["staged.py", "both ways.py", "new.py"]
+    assert unstaged == ["unstaged.py", "both ways.py"]
+    assert is_repo is True
+    mock_run.assert_called_once_with(["git", "status", "--porcelain=v2", "-z"])
+
+def test_status_is_shared_with_wrappers(mocker):
+    """Test file queries reuse the status parse until the cache is cleared"""
+    mock_run = mocker.patch("auto_commit_bot.git_utils.run_git_command")
+    mock_run.return_value = ("1 M. N... 100644 100644 100644 abc def staged.py\0", "", 0)
+    
+    collect_repo_state()
+    assert collect_repo_state() == (["staged.py"], [], True)
+    assert has_staged_changes() is True
+    assert get_changed_files(staged=True) == ["staged.py"]
+    assert get_changed_files(staged=False) == []
+    assert mock_run.call_count == 1
+    
+    clear_cache()
+    get_changed_files(staged=True)
+    assert mock_run.call_count == 2
+
+def test_collect_repo_state_not_repo(mocker):
+    """Test collecting repository state outside a repository"""
+    mock_run = mocker.patch("auto_commit_bot.git_utils.run_git_command")
+    mock_run.return_value = ("", "fatal: not a git repository", 128)
+    assert collect_repo_state() == ([], [], False)
+
+def test_repo_session_discover(mocker, tmp_path, monkeypatch):
+    """Test RepoSession gathers status and diff once"""
+    (tmp_path / ".git").mkdir()
+    monkeypatch.chdir(tmp_path)
+    mocker.patch("auto_commit_bot.git_utils.collect_repo_state",
+                 return_value=(["file1.py"], ["file2.py"], True))
+    mock_diff = mocker.patch("auto_commit_bot.git_utils.get_git_diff", return_value="+change")
+    
+    session = RepoSession.discover()
+    assert session == RepoSession(root=tmp_path, staged=["file1.py"],
+                                  unstaged=["file2.py"], diff="+change")
+    mock_diff.assert_called_once_with(staged=True, max_length=3000)
+
+def test_repo_session_discover_not_repo(mocker):
+    """Test RepoSession outside a repository"""
+    mocker.patch("auto_commit_bot.git_utils.collect_repo_state", return_value=([], [], False))
+    assert RepoSession.discover() is None
@@ -1,15 +1,34 @@
 """
 Tests for the LLM utilities module
 """
+import json
+import logging
 import os
+import subprocess
+import sys
 import pytest
 from unittest.mock import MagicMock, patch
-from auto_commit_bot.llm_utils import LLMProvider, DEFAULT_PROMPT_TEMPLATE
+from auto_commit_bot.llm_utils import (
+    LLMProvider,
+    DEFAULT_PROMPT_TEMPLATE,
+    rule_based_message,
+    _quantization_kwargs,
+    _load_onnx_model,
+    _prune_cache,
+    _CACHE_TTL,
+    _truncate_lines,
+    _extract_commit_tag
+)
+
+def _sse_lines(*chunks):
+    """Build the server-sent event lines of a streamed chat completion"""
+    frames = [json.dumps({"choices": [{"delta": {"content": chunk}}]}) for chunk in chunks]
+    return [f"data: {frame}".encode() for frame in frames] + [b"data: [DONE]"]
 
 @pytest.fixture
 def mock_config(mocker):
     """Mock configuration"""
-    mock = mocker.patch("auto_commit_bot.llm_utils.config")
+    mock = mocker.patch("auto_commit_bot.llm_utils.get_config").return_value
     mock.get.side_effect = lambda key, default=None: {
         "provider_type": "api",
         "model_name": "gpt2",
@@ -29,20 +48,21 @@ def mock_requests(mocker):
 @pytest.fixture
 def mock_transformers(mocker):
     """Mock transformers components"""
+    torch = pytest.importorskip("torch")
     mock_tokenizer = MagicMock()
     mock_tokenizer.eos_token_id = 50256
-    mocker.patch("auto_commit_bot.llm_utils.AutoTokenizer.from_pretrained",
+    mock_tokenizer.model_max_length = 1024
+    mock_tokenizer.encode.return_value = [1, 2]
+    mock_tokenizer.decode.return_value = "feat(test): add new feature"
+    mocker.patch("transformers.AutoTokenizer.from_pretrained",
                 return_value=mock_tokenizer)
     
     mock_model = MagicMock()
-    mocker.patch("auto_commit_bot.llm_utils.AutoModelForCausalLM.from_pretrained",
+    # Input tensors are created directly on the model's device
+    mock_model.device = torch.device("cpu")
+    mocker.patch("transformers.AutoModelForCausalLM.from_pretrained",
                 return_value=mock_model)
-    
-    mock_pipeline = mocker.patch("auto_commit_bot.llm_utils.pipeline")
-    mock_pipeline.return_value.return_value = [
-        {"generated_text": "feat(test): add new feature"}
-    ]
-    return mock_pipeline
+    return mock_model
 
 def test_llm_provider_init_api(mock_config):
     """Test LLMProvider initialization with API"""
@@ -59,20 +79,35 @@ def test_llm_provider_init_local(mock_config, mock_transformers):
     
     provider = LLMProvider()
     assert provider.provider_type == "local"
-    mock_transformers.assert_called_once()
+    assert provider.model is mock_transformers
+    mock_transformers.eval.assert_called_once()
 
 def test_generate_commit_message_api(mock_config, mock_requests):
     """Test commit message generation with API"""
+    response = mock_requests.Session.return_value.post.return_value
+    response.status_code = 200
+    response.iter_lines.return_value = _sse_lines("<commit>feat(test): ", "add new feature</commit>")
     provider = LLMProvider()
     message = provider.generate_commit_message("test diff")
     
     assert message == "feat(test): add new feature"
-    mock_requests.post.assert_called_once_with(
-        provider.api_url,
-        headers=provider.headers,
-        json={"inputs": provider._get_prompt_template().format(diff="test diff"),
-              "parameters": {"max_length": 128}}
-    )
+    mock_requests.post.assert_not_called()
+    session = mock_requests.Session.return_value
+    session.headers.update.assert_called_once_with(provider.headers)
+    session.post.assert_called_once()
+    assert session.post.call_args.kwargs["timeout"] == (3.05, 30)
+    assert session.post.call_args.kwargs["stream"] is True
+
+def test_generate_commit_message_api_stops_at_closing_tag(mock_config, mock_requests):
+    """Test streaming stops reading once the commit tag is closed"""
+    response = mock_requests.Session.return_value.post.return_value
+    response.status_code = 200
+    lines = iter(_sse_lines("<commit>fix: a</com", "mit>", "trailing explanation"))
+    response.iter_lines.return_value = lines
+    
+    provider = LLMProvider()
+    assert provider.generate_commit_message("test diff") == "fix: a"
+    assert next(lines) == b'data: {"choices": [{"delta": {"content": "trailing explanation"}}]}'
 
 def test_generate_commit_message_local(mock_config, mock_transformers):
     """Test commit message generation with local model"""
@@ -85,11 +120,15 @@ def test_generate_commit_message_local(mock_config, mock_transformers):
     message = provider.generate_commit_message("test diff")
     
     assert message == "feat(test): add new feature"
-    assert mock_transformers.return_value.call_count == 1
+    assert mock_transformers.generate.call_count == 1
+    assert mock_transformers.generate.call_args.kwargs["max_new_tokens"] == 96
+    assert mock_transformers.generate.call_args.kwargs["stop_strings"] == ["</commit>"]
+    # The template prefix is run through the model once and reused as a cache
+    assert "past_key_values" in mock_transformers.generate.call_args.kwargs
 
 def test_generate_commit_message_error(mock_config, mock_requests):
     """Test commit message generation with error"""
-    mock_requests.post.side_effect = Exception("API Error")
+    mock_requests.Session.return_value.post.side_effect = Exception("API Error")
     
     provider = LLMProvider()
     message = provider.generate_commit_message("test diff")
@@ -118,4 +157,173 @@ def test_get_prompt_template_custom(mock_config, tmp_path):
     provider = LLMProvider()
     template = provider._get_prompt_template()
     
-    assert template == custom_template 
\ No newline at end of file
+    assert template == custom_template
+
+def test_generate_prompt_matches_template(mock_config):
+    """Test prompt building matches formatting the default template"""
+    provider = LLMProvider()
+    for format_type in ("short", "detailed"):
+        assert provider._generate_prompt("test diff", format_type) == \
+            DEFAULT_PROMPT_TEMPLATE.format(diff="test diff", format_type=format_type)
+
+def test_clean_commit_message_extracts_tags(mock_config):
+    """Test commit message extraction from tagged output"""
+    provider = LLMProvider()
+    raw = "Sure!\n<commit>\nfix(api): handle empty response\n</commit>\nHope this helps."
+    assert provider._clean_commit_message(raw) == "fix(api): handle empty response"
+
+def test_clean_commit_message_requires_type_delimiter(mock_config):
+    """Test words that merely start with a type are not taken as commit types"""
+    provider = LLMProvider()
+    raw = "features were added\nfeat!: drop legacy config format"
+    assert provider._clean_commit_message(raw) == "feat!: drop legacy config format"
+
+def test_clean_commit_message_short_fallback(mock_config):
+    """Test short format falls back to the first non-empty line"""
+    provider = LLMProvider()
+    assert provider._clean_commit_message("\n  update readme  \nmore text") == "update readme"
+    assert provider._clean_commit_message(" \n ") == ""
+    assert provider._clean_commit_message(" \n ", format_type="detailed") == ""
+
+def test_clean_commit_message_detailed_body(mock_config):
+    """Test detailed format keeps the body and drops extra subject lines"""
+    provider = LLMProvider()
+    raw = "<commit>feat: add cache\n\nStore messages on disk\nfix: stray subject\n</commit>"
+    assert provider._clean_commit_message(raw, format_type="detailed") == \
+        "feat: add cache\n\nStore messages on disk"
+
+def test_generate_commit_messages_api(mock_config, mock_requests):
+    """Test batch generation keeps results in the order of the diffs"""
+    def respond(url, data, timeout, stream):
+        response = MagicMock(status_code=200)
+        diff = json.loads(data)["messages"][1]["content"].split("Git diff:\n")[1].split("\n")[0]
+        response.iter_lines.return_value = _sse_lines(f"<commit>fix: {diff}</commit>")
+        return response
+    mock_requests.Session.return_value.post.side_effect = respond
+    
+    provider = LLMProvider()
+    messages = provider.generate_commit_messages(["one", "two", "three"])
+    
+    assert messages == ["fix: one", "fix: two", "fix: three"]
+    assert mock_requests.Session.return_value.post.call_count == 3
+
+def test_generate_commit_messages_local(mock_config, mock_transformers):
+    """Test local batch generation shares one generate call"""
+    mock_config.get.side_effect = lambda key, default=None: {
+        "provider_type": "local",
+        "model_name": "gpt2"
+    }.get(key, default)
+    
+    provider = LLMProvider()
+    provider.tokenizer.batch_decode.return_value = ["<commit>fix: one</commit>", "<commit>fix: two</commit>"]
+    messages = provider.generate_commit_messages(["one", "two"])
+    
+    assert messages == ["fix: one", "fix: two"]
+    assert mock_transformers.generate.call_count == 1
+    assert provider.tokenizer.padding_side == "left"
+
+def test_generate_commit_messages_local_rejects_invalid(mock_config, mock_transformers):
+    """Test batch rows without a commit type are empty, like single generation"""
+    mock_config.get.side_effect = lambda key, default=None: {
+        "provider_type": "local",
+        "model_name": "gpt2"
+    }.get(key, default)
+    
+    provider = LLMProvider()
+    provider.tokenizer.batch_decode.return_value = ["<commit>fix: one</commit>", "some rambling text"]
+    assert provider.generate_commit_messages(["one", "two"]) == ["fix: one", ""]
+
+def test_quantization_kwargs_disabled():
+    """Test full precision loading when quantization is off"""
+    assert _quantization_kwargs(None) == {}
+    assert _quantization_kwargs("fp16") == {}
+
+def test_load_onnx_model_without_optimum(mocker):
+    """Test the onnx backend falls back when optimum is not installed"""
+    mocker.patch("importlib.util.find_spec", return_value=None)
+    assert _load_onnx_model("gpt2") is None
+
+def test_load_onnx_model_export_failure(mocker, tmp_path):
+    """Test a failed export falls back without leaving a cached model behind"""
+    mocker.patch("importlib.util.find_spec", return_value=True)
+    mocker.patch("auto_commit_bot.llm_utils._ONNX_CACHE_DIR", str(tmp_path))
+    onnxruntime = MagicMock()
+    onnxruntime.ORTModelForCausalLM.from_pretrained.side_effect = RuntimeError("unsupported architecture")
+    mocker.patch.dict(sys.modules, {
+        "optimum": MagicMock(),
+        "optimum.onnxruntime": onnxruntime,
+        "optimum.onnxruntime.configuration": MagicMock()
+    })
+    
+    assert _load_onnx_model("org/model") is None
+    assert list((tmp_path / "org--model").iterdir()) == []
+
+def test_generate_commit_message_uses_cache(mock_config, mock_requests, tmp_path):
+    """Test repeated diffs are answered from the message cache"""
+    mock_config.get.side_effect = lambda key, default=None: {
+        "provider_type": "api",
+        "huggingface_api_key": "test-key",
+        "cache_file": str(tmp_path / "cache")
+    }.get(key, default)
+    response = mock_requests.Session.return_value.post.return_value
+    response.status_code = 200
+    response.iter_lines.return_value = _sse_lines("<commit>feat(test): ", "add new feature</commit>")
+    
+    provider = LLMProvider()
+    assert provider.generate_commit_message("test diff") == "feat(test): add new feature"
+    assert provider.generate_commit_message("test diff") == "feat(test): add new feature"
+    assert mock_requests.Session.return_value.post.call_count == 1
+    
+    # A different diff or format misses the cache
+    provider.generate_commit_message("other diff")
+    provider.generate_commit_message("test diff", format_type="detailed")
+    assert mock_requests.Session.return_value.post.call_count == 3
+
+def test_prune_cache(mocker):
+    """Test pruning drops expired entries, then the oldest, down to half the cap"""
+    mocker.patch("auto_commit_bot.llm_utils._CACHE_MAX_ENTRIES", 4)
+    now = 10 * _CACHE_TTL
+    cache = {f"k{i}": (now - i, "msg") for i in range(5)}
+    cache["expired"] = (now - _CACHE_TTL, "msg")
+    _prune_cache(cache, now)
+    assert sorted(cache) == ["k0", "k1"]
+    
+    # Below the cap only expired entries go
+    cache["expired"] = (now - _CACHE_TTL, "msg")
+    _prune_cache(cache, now)
+    assert sorted(cache) == ["k0", "k1"]
+
+def test_truncate_lines():
+    """Test diffs are cut to the first lines without splitting them"""
+    text = "\n".join(f"+line {i}" for i in range(200))
+    assert _truncate_lines(text, 100) == "\n".join(text.splitlines()[:100])
+    assert _truncate_lines("+a\n+b", 100) == "+a\n+b"
+    # Exactly max_lines lines with a trailing newline is kept as is
+    assert _truncate_lines("+a\n+b\n", 2) == "+a\n+b\n"
+
+def test_extract_commit_tag():
+    """Test commit tags are found with or without the closing tag"""
+    assert _extract_commit_tag("x <commit> feat: a </commit> y") == "feat: a"
+    assert _extract_commit_tag("<commit>feat: a") == "feat: a"
+    assert _extract_commit_tag("feat: a") is None
+
+def test_progress_output_is_debug_logging(mock_config, mock_requests, capsys, caplog):
+    """Test progress messages go to debug logging instead of stdout"""
+    with caplog.at_level(logging.DEBUG, logger="auto_commit_bot"):
+        LLMProvider()
+    assert "Initializing LLM Provider" not in capsys.readouterr().out
+    assert "Initializing LLM Provider" in caplog.text
+
+def test_rule_based_message():
+    """Test obvious changes are named from the file paths alone"""
+    assert rule_based_message(["README.md", "docs/conf.py"]) == "docs: update documentation"
+    assert rule_based_message(["tests/test_cli.py", "src/pkg/tests/data.json"]) == "test: update tests"
+    assert rule_based_message(["pyproject.toml", "web/package-lock.json"]) == "chore(deps): update dependencies"
+    assert rule_based_message(["README.md", "src/cli.py"]) is None
+
+def test_import_does_not_load_transformers():
+    """Test the API code path does not import transformers"""
+    code = "import sys, auto_commit_bot.llm_utils; print('transformers' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)})
+    assert result.stdout.strip() == "False"